@@ -7,14 +7,62 @@ Outputs a JSON report with project structure, dependencies, and architecture det
 import os
 import sys
 import json
+import mmap
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from pathlib import Path
-from dataclasses import dataclass, field, asdict
-from typing import Optional
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Iterator, Optional
 from datetime import datetime
 
 
-@dataclass
+# Patterns compiled once at import time; analyze_swift_file runs per file.
+# Imports and type declarations share one pattern so each file is scanned a
+# single time. Comments and string literals are matched too, so that their
+# text is consumed without yielding names (those matches have empty groups).
+# The leading lookahead lets the regex engine skip straight to bytes that
+# can start a match. Swift keywords are ASCII, so matching runs on raw
+# bytes and only the captured names are decoded. Bytes-mode \w is ASCII
+# only, so identifier classes also take every non-ASCII byte to keep
+# UTF-8 names whole.
+_DECL_RE = re.compile(
+    rb'(?=[/"icsep])(?:'
+    rb'//[^\n]*'
+    rb'|/\*(?s:.*?)\*/'
+    rb'|"""(?s:.*?)"""'
+    rb'|"(?:[^"\\\n]|\\.)*"'
+    rb'|^import\s+([\w\x80-\xff]+)'
+    rb'|(?<![\w\x80-\xff])(class|struct|enum|protocol)\s+([\w\x80-\xff]+)'
+    rb')',
+    re.MULTILINE
+)
+
+# Imports alone, for classify_swift_file. Unlike _DECL_RE this doesn't step
+# over comments and strings, so it is cheaper but also counts an import
+# line inside a block comment or multi-line string.
+_IMPORT_RE = re.compile(rb'^import\s+([\w\x80-\xff]+)', re.MULTILINE)
+
+# Dependency manifest patterns
+_POD_RE = re.compile(r"pod\s+['\"]([^'\"]+)['\"](?:\s*,\s*['\"]([^'\"]+)['\"])?")
+_SPM_URL_RE = re.compile(r'\.package\s*\(\s*url:\s*"([^"]+)"')
+_CARTHAGE_RE = re.compile(r'(?:github|git)\s+"([^"]+)"')
+
+# Dependency and build output directories that never hold project sources
+EXCLUDED_DIRS = frozenset({'Pods', 'Carthage', 'build', '.build', 'DerivedData'})
+
+# Below this many files a process pool costs more to start than it saves
+PARALLEL_MIN_FILES = 64
+
+# Files above this size are memory-mapped; smaller ones are cheaper to read
+MMAP_THRESHOLD = 64 * 1024
+MMAP_CHUNK = 1024 * 1024
+
+# Bump whenever analyze_swift_file's output changes so stale caches are dropped
+CACHE_VERSION = 3
+
+
+@dataclass(slots=True)
 class SwiftFile:
     path: str
     name: str
@@ -31,14 +79,14 @@ class SwiftFile:
     line_count: int = 0
 
 
-@dataclass
+@dataclass(slots=True)
 class Dependency:
     name: str
     version: Optional[str]
     source: str  # cocoapods, spm, carthage
 
 
-@dataclass
+@dataclass(slots=True)
 class ProjectAnalysis:
     project_name: str
     ios_path: str
@@ -81,8 +129,106 @@ class ProjectAnalysis:
     complexity_notes: list[str] = field(default_factory=list)
 
 
+def _count_lines(content) -> int:
+    """Count lines in a bytes or mmap buffer without splitting it."""
+    if isinstance(content, bytes):
+        count = content.count(b'\n')
+    else:
+        # mmap has no count(); tally it in bounded slices instead
+        count = sum(content[i:i + MMAP_CHUNK].count(b'\n')
+                    for i in range(0, len(content), MMAP_CHUNK))
+    if len(content) and content[-1] != 0x0A:
+        count += 1
+    return count
+
+
+def _scan_swift_source(sf: SwiftFile, content, path_lower: str, name_lower: str) -> None:
+    """Fill in a SwiftFile from its raw bytes (a bytes object or an mmap)."""
+    sf.line_count = _count_lines(content)
+    
+    # Detect imports and type declarations in one pass, dispatching each
+    # declaration keyword straight to its list
+    declarations = {
+        b'class': sf.classes,
+        b'struct': sf.structs,
+        b'enum': sf.enums,
+        b'protocol': sf.protocols,
+    }
+    for imported, keyword, name in _DECL_RE.findall(content):
+        if imported:
+            sf.imports.append(imported.decode('utf-8', 'replace'))
+        elif keyword:
+            declarations[keyword].append(name.decode('utf-8', 'replace'))
+    
+    _classify_swift_source(sf, content, path_lower, name_lower)
+
+
+def _classify_swift_source(sf: SwiftFile, content, path_lower: str, name_lower: str) -> None:
+    """Set a SwiftFile's framework flags and type from its imports, path and content."""
+    # Keywords are searched for only where a flag or branch below consults
+    # them, so short-circuiting skips most of the searches and each one is
+    # remembered. find() is used because `in` on an mmap only tests for
+    # single bytes.
+    found = {}
+    def has(keyword: bytes) -> bool:
+        if keyword not in found:
+            found[keyword] = content.find(keyword) != -1
+        return found[keyword]
+    
+    # Detect SwiftUI/UIKit usage
+    sf.uses_swiftui = 'SwiftUI' in sf.imports or has(b'View') and has(b'body:')
+    sf.uses_uikit = 'UIKit' in sf.imports or has(b'UIViewController')
+    sf.uses_combine = 'Combine' in sf.imports or has(b'@Published')
+    sf.uses_async_await = has(b'async') and (has(b'await') or has(b'throws'))
+    
+    # Classify file type based on content and path. The branches are in
+    # priority order (e.g. a SwiftUI view under Models/ is a view), so
+    # they must not be reordered by how often each one matches.
+    if 'test' in path_lower or name_lower.endswith('tests') or name_lower.endswith('test'):
+        sf.type = "test"
+    elif 'viewmodel' in name_lower or 'vm' in name_lower:
+        sf.type = "viewmodel"
+    elif sf.uses_swiftui and (has(b'View') or has(b'body:')):
+        sf.type = "view"
+    elif sf.uses_uikit and has(b'UIViewController'):
+        sf.type = "view"
+    elif 'model' in path_lower or (has(b'struct') and has(b'Codable')):
+        sf.type = "model"
+    elif 'service' in path_lower or 'api' in path_lower or 'network' in path_lower:
+        sf.type = "service"
+    elif 'extension' in path_lower or name_lower.endswith('+'):
+        sf.type = "extension"
+    elif 'util' in path_lower or 'helper' in path_lower:
+        sf.type = "utility"
+
+
+def _classify_swift_imports(sf: SwiftFile, content, path_lower: str, name_lower: str) -> None:
+    """Classify a SwiftFile from its imports alone, without a declaration scan."""
+    sf.imports = [name.decode('utf-8', 'replace') for name in _IMPORT_RE.findall(content)]
+    _classify_swift_source(sf, content, path_lower, name_lower)
+
+
 def analyze_swift_file(filepath: Path, project_root: Path) -> SwiftFile:
-    """Analyze a single Swift file."""
+    """Analyze a single Swift file.
+    
+    Imports and type declarations inside comments or string literals are
+    ignored; keyword flags (SwiftUI, Combine, ...) still see the whole file.
+    Files larger than MMAP_THRESHOLD are memory-mapped rather than read.
+    """
+    return _read_swift_file(filepath, project_root, _scan_swift_source)
+
+
+def classify_swift_file(filepath: Path, project_root: Path) -> SwiftFile:
+    """Classify a single Swift file with analyze_swift_file's rules.
+    
+    Cheaper for callers that only need the file type: declarations and the
+    line count are not collected, and imports come from _IMPORT_RE.
+    """
+    return _read_swift_file(filepath, project_root, _classify_swift_imports)
+
+
+def _read_swift_file(filepath: Path, project_root: Path, scan) -> SwiftFile:
+    """Open a Swift file and fill in a SwiftFile for it with scan."""
     relative_path = str(filepath.relative_to(project_root))
     
     sf = SwiftFile(
@@ -91,51 +237,48 @@ def analyze_swift_file(filepath: Path, project_root: Path) -> SwiftFile:
         type="other"
     )
     
+    path_lower = relative_path.lower()
+    name_lower = sf.name.lower()
+    
+    with filepath.open('rb') as f:
+        if os.fstat(f.fileno()).st_size > MMAP_THRESHOLD:
+            # Let the page cache back large generated files instead of
+            # copying them onto the Python heap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                scan(sf, content, path_lower, name_lower)
+        else:
+            scan(sf, f.read(), path_lower, name_lower)
+    
+    return sf
+
+
+def _analyze_or_report(filepath: Path, project_root: Path) -> tuple[SwiftFile, Optional[str]]:
+    """Analyze a file, returning a placeholder and the error instead of raising."""
     try:
-        content = filepath.read_text(encoding='utf-8', errors='ignore')
-        sf.line_count = len(content.splitlines())
-        
-        # Detect imports
-        import_pattern = r'^import\s+(\w+)'
-        sf.imports = re.findall(import_pattern, content, re.MULTILINE)
-        
-        # Detect SwiftUI/UIKit usage
-        sf.uses_swiftui = 'SwiftUI' in sf.imports or 'View' in content and 'body:' in content
-        sf.uses_uikit = 'UIKit' in sf.imports or 'UIViewController' in content
-        sf.uses_combine = 'Combine' in sf.imports or '@Published' in content
-        sf.uses_async_await = 'async' in content and ('await' in content or 'throws' in content)
-        
-        # Detect type declarations
-        sf.classes = re.findall(r'class\s+(\w+)', content)
-        sf.structs = re.findall(r'struct\s+(\w+)', content)
-        sf.enums = re.findall(r'enum\s+(\w+)', content)
-        sf.protocols = re.findall(r'protocol\s+(\w+)', content)
-        
-        # Classify file type based on content and path
-        path_lower = relative_path.lower()
-        name_lower = sf.name.lower()
-        
-        if 'test' in path_lower or name_lower.endswith('tests') or name_lower.endswith('test'):
-            sf.type = "test"
-        elif 'viewmodel' in name_lower or 'vm' in name_lower:
-            sf.type = "viewmodel"
-        elif sf.uses_swiftui and ('View' in content or 'body:' in content):
-            sf.type = "view"
-        elif sf.uses_uikit and 'UIViewController' in content:
-            sf.type = "view"
-        elif 'model' in path_lower or ('struct' in content.lower() and 'Codable' in content):
-            sf.type = "model"
-        elif 'service' in path_lower or 'api' in path_lower or 'network' in path_lower:
-            sf.type = "service"
-        elif 'extension' in path_lower or name_lower.endswith('+'):
-            sf.type = "extension"
-        elif 'util' in path_lower or 'helper' in path_lower:
-            sf.type = "utility"
-            
+        return analyze_swift_file(filepath, project_root), None
     except Exception as e:
-        print(f"Warning: Could not analyze {filepath}: {e}", file=sys.stderr)
+        sf = SwiftFile(path=str(filepath.relative_to(project_root)), name=filepath.stem, type="other")
+        return sf, f"{filepath}: {e}"
+
+
+def load_analysis_cache(cache_path: Path) -> dict:
+    """Load per-file analysis results keyed by relative path."""
+    if not cache_path.exists():
+        return {}
     
-    return sf
+    try:
+        data = json.loads(cache_path.read_text())
+    except (json.JSONDecodeError, OSError):
+        return {}
+    if data.get('version') != CACHE_VERSION:
+        return {}
+    return data.get('files', {})
+
+
+def save_analysis_cache(cache_path: Path, entries: dict) -> None:
+    """Save per-file analysis results as [mtime_ns, size, fields] entries."""
+    data = {'version': CACHE_VERSION, 'files': entries}
+    cache_path.write_text(json.dumps(data, default=_json_default))
 
 
 def parse_podfile(podfile_path: Path) -> list[Dependency]:
@@ -144,8 +287,7 @@ def parse_podfile(podfile_path: Path) -> list[Dependency]:
     try:
         content = podfile_path.read_text()
         # Match pod 'Name', '~> 1.0' or pod 'Name'
-        pattern = r"pod\s+['\"]([^'\"]+)['\"](?:\s*,\s*['\"]([^'\"]+)['\"])?"
-        for match in re.finditer(pattern, content):
+        for match in _POD_RE.finditer(content):
             deps.append(Dependency(
                 name=match.group(1),
                 version=match.group(2),
@@ -162,8 +304,7 @@ def parse_package_swift(package_path: Path) -> list[Dependency]:
     try:
         content = package_path.read_text()
         # Match .package(url: "...", from: "1.0.0") or .package(name: "...", ...)
-        url_pattern = r'\.package\s*\(\s*url:\s*"([^"]+)"'
-        for match in re.finditer(url_pattern, content):
+        for match in _SPM_URL_RE.finditer(content):
             url = match.group(1)
             name = url.split('/')[-1].replace('.git', '')
             deps.append(Dependency(name=name, version=None, source="spm"))
@@ -178,8 +319,7 @@ def parse_cartfile(cartfile_path: Path) -> list[Dependency]:
     try:
         content = cartfile_path.read_text()
         # Match github "Owner/Repo" ~> 1.0
-        pattern = r'(?:github|git)\s+"([^"]+)"'
-        for match in re.finditer(pattern, content):
+        for match in _CARTHAGE_RE.finditer(content):
             repo = match.group(1)
             name = repo.split('/')[-1] if '/' in repo else repo
             deps.append(Dependency(name=name, version=None, source="carthage"))
@@ -266,8 +406,34 @@ def calculate_complexity(analysis: ProjectAnalysis) -> tuple[int, list[str]]:
     return min(score, 10), notes
 
 
-def analyze_project(ios_path: str) -> ProjectAnalysis:
-    """Analyze an iOS project directory."""
+def iter_swift_files(root: str, excluded: frozenset = EXCLUDED_DIRS) -> Iterator[str]:
+    """Yield paths of Swift files under root, skipping excluded directory names.
+    
+    Uses os.scandir directly so file types come from the directory entries
+    and excluded trees are never opened.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in excluded:
+                        stack.append(entry.path)
+                elif entry.name.endswith('.swift'):
+                    yield entry.path
+
+
+def analyze_project(ios_path: str, cache_file: Optional[str] = None) -> ProjectAnalysis:
+    """Analyze an iOS project directory.
+    
+    When cache_file is given, files whose mtime and size match the cached
+    entry reuse the stored result instead of being re-analyzed.
+    """
     root = Path(ios_path).resolve()
     
     if not root.exists():
@@ -283,18 +449,67 @@ def analyze_project(ios_path: str) -> ProjectAnalysis:
         analyzed_at=datetime.now().isoformat()
     )
     
-    # Collect all Swift files
-    swift_files = list(root.rglob("*.swift"))
-    # Exclude Pods, Carthage, build directories
-    swift_files = [f for f in swift_files if not any(
-        x in str(f) for x in ['Pods/', 'Carthage/', 'build/', '.build/', 'DerivedData/']
-    )]
+    # Collect all Swift files, pruning Pods, Carthage and build directories
+    swift_files = [Path(p) for p in iter_swift_files(str(root))]
     
     analysis.total_swift_files = len(swift_files)
     
-    # Analyze each file
+    # Reuse cached results for files unchanged since the last run
+    cache = load_analysis_cache(Path(cache_file)) if cache_file else {}
+    stats = {}
+    cached = {}
+    pending = []
     for filepath in swift_files:
-        sf = analyze_swift_file(filepath, root)
+        relative_path = str(filepath.relative_to(root))
+        try:
+            st = filepath.stat()
+        except OSError:
+            # e.g. a dangling symlink; analysis will report it below
+            stats[relative_path] = None
+            pending.append(filepath)
+            continue
+        stats[relative_path] = [st.st_mtime_ns, st.st_size]
+        entry = cache.get(relative_path)
+        if entry and entry[:2] == stats[relative_path]:
+            cached[relative_path] = SwiftFile(**entry[2])
+        else:
+            pending.append(filepath)
+    
+    # Analyze the remaining files; files are independent, so large projects
+    # fan out across processes and the results are folded in below
+    analyze = partial(_analyze_or_report, project_root=root)
+    if len(pending) >= PARALLEL_MIN_FILES:
+        workers = os.cpu_count() or 1
+        chunksize = max(1, len(pending) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            analyzed = list(executor.map(analyze, pending, chunksize=chunksize))
+    else:
+        analyzed = [analyze(filepath) for filepath in pending]
+    
+    # Unreadable files are reported together once the batch is done
+    errors = [error for _, error in analyzed if error]
+    if errors:
+        print(f"Warning: Could not analyze {len(errors)} file(s):\n  " + "\n  ".join(errors),
+              file=sys.stderr)
+    
+    # Merge back in discovery order so output doesn't depend on cache hits
+    analyzed_iter = (sf for sf, _ in analyzed)
+    results = [cached[path] if path in cached else next(analyzed_iter) for path in stats]
+    
+    if cache_file:
+        # Failed files are left out so the next run retries them
+        failed = {sf.path for sf, error in analyzed if error}
+        save_analysis_cache(Path(cache_file), {
+            sf.path: [*stats[sf.path], sf] for sf in results if sf.path not in failed
+        })
+    
+    # Framework detection and UI tallies are gathered in the same loop that
+    # categorizes files, rather than re-walking the categories afterwards
+    all_imports = set()
+    swiftui_count = 0
+    uikit_count = 0
+    
+    for sf in results:
         analysis.total_lines += sf.line_count
         
         # Update framework usage
@@ -308,6 +523,10 @@ def analyze_project(ios_path: str) -> ProjectAnalysis:
             analysis.model_files.append(sf)
         elif sf.type == "view":
             analysis.view_files.append(sf)
+            if sf.uses_swiftui:
+                swiftui_count += 1
+            if sf.uses_uikit:
+                uikit_count += 1
         elif sf.type == "viewmodel":
             analysis.viewmodel_files.append(sf)
         elif sf.type == "service":
@@ -320,11 +539,12 @@ def analyze_project(ios_path: str) -> ProjectAnalysis:
             analysis.test_files.append(sf)
         else:
             analysis.other_files.append(sf)
+        
+        # Extensions, utilities and tests don't count towards framework usage
+        if sf.type not in ("extension", "utility", "test"):
+            all_imports.update(sf.imports)
     
     # Determine UI framework
-    swiftui_count = sum(1 for f in analysis.view_files if f.uses_swiftui)
-    uikit_count = sum(1 for f in analysis.view_files if f.uses_uikit)
-    
     if swiftui_count > 0 and uikit_count > 0:
         analysis.ui_framework = "hybrid"
     elif swiftui_count > 0:
@@ -346,12 +566,6 @@ def analyze_project(ios_path: str) -> ProjectAnalysis:
         analysis.dependencies.extend(parse_cartfile(cartfile))
     
     # Check for common frameworks
-    all_imports = set()
-    for files in [analysis.model_files, analysis.view_files, analysis.viewmodel_files,
-                  analysis.service_files, analysis.other_files]:
-        for f in files:
-            all_imports.update(f.imports)
-    
     dep_names = {d.name.lower() for d in analysis.dependencies}
     
     analysis.uses_core_data = 'CoreData' in all_imports
@@ -369,31 +583,47 @@ def analyze_project(ios_path: str) -> ProjectAnalysis:
     return analysis
 
 
+def _json_default(obj):
+    """Serialize dataclasses by their attributes without deep-copying them."""
+    if is_dataclass(obj):
+        # Slotted dataclasses have no __dict__, so read the fields directly
+        return {f.name: getattr(obj, f.name) for f in fields(obj)}
+    return str(obj)
+
+
 def main():
     if len(sys.argv) < 2:
-        print("Usage: analyze_ios.py <ios-project-path> [--output <file.json>]")
+        print("Usage: analyze_ios.py <ios-project-path> [--output <file.json>] [--cache <file.json>]")
         print("\nAnalyzes an iOS Swift project and outputs a JSON report.")
+        print("With --cache, unchanged files reuse results from the previous run.")
         sys.exit(1)
     
     ios_path = sys.argv[1]
     output_file = None
+    cache_file = None
     
     if '--output' in sys.argv:
         idx = sys.argv.index('--output')
         if idx + 1 < len(sys.argv):
             output_file = sys.argv[idx + 1]
     
+    if '--cache' in sys.argv:
+        idx = sys.argv.index('--cache')
+        if idx + 1 < len(sys.argv):
+            cache_file = sys.argv[idx + 1]
+    
     try:
-        analysis = analyze_project(ios_path)
-        result = asdict(analysis)
-        
-        json_output = json.dumps(result, indent=2, default=str)
+        analysis = analyze_project(ios_path, cache_file)
         
+        # Encode straight into the destination instead of building the whole
+        # document as one string first
         if output_file:
-            Path(output_file).write_text(json_output)
+            with open(output_file, 'w') as f:
+                json.dump(analysis, f, indent=2, default=_json_default)
             print(f"Analysis saved to: {output_file}")
         else:
-            print(json_output)
+            json.dump(analysis, sys.stdout, indent=2, default=_json_default)
+            sys.stdout.write('\n')
             
     except Exception as e:
         print(f"Error analyzing project: {e}", file=sys.stderr)
@@ -8,12 +8,14 @@ import os
 import sys
 import json
 import re
-import shutil
 import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from dataclasses import dataclass
+from dataclasses import dataclass, field, asdict
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
 
 @dataclass
@@ -25,6 +27,22 @@ class ConversionConfig:
     target_sdk: int = 34
     use_compose: bool = True
     di_framework: str = "hilt"  # hilt, koin, manual
+    
+    # Derived once from the fields above
+    pkg_path: str = field(init=False)
+    main_root: Path = field(init=False)
+    java_root: Path = field(init=False)
+    res_root: Path = field(init=False)
+    
+    def __post_init__(self):
+        self.pkg_path = self.package_name.replace('.', '/')
+        self.main_root = self.android_path / "app" / "src" / "main"
+        self.java_root = self.main_root / "java" / self.pkg_path
+        self.res_root = self.main_root / "res"
+
+
+# Below this many files, converting serially beats thread pool overhead
+PARALLEL_MIN_FILES = 4
 
 
 # Gradle templates
@@ -135,164 +153,260 @@ include(":app")
 '''
 
 
+# Compose theme file bodies; only the package line and theme name vary
+THEME_COLOR_BODY = '''import androidx.compose.ui.graphics.Color
+
+val Purple80 = Color(0xFFD0BCFF)
+val PurpleGrey80 = Color(0xFFCCC2DC)
+val Pink80 = Color(0xFFEFB8C8)
+val Purple40 = Color(0xFF6650a4)
+val PurpleGrey40 = Color(0xFF625b71)
+val Pink40 = Color(0xFF7D5260)
+'''
+
+THEME_TYPE_BODY = '''import androidx.compose.material3.Typography
+import androidx.compose.ui.text.TextStyle
+import androidx.compose.ui.text.font.FontFamily
+import androidx.compose.ui.text.font.FontWeight
+import androidx.compose.ui.unit.sp
+
+val Typography = Typography(
+    bodyLarge = TextStyle(fontFamily = FontFamily.Default, fontWeight = FontWeight.Normal, fontSize = 16.sp, lineHeight = 24.sp, letterSpacing = 0.5.sp)
+)
+'''
+
+THEME_THEME_IMPORTS = '''import android.app.Activity
+import android.os.Build
+import androidx.compose.foundation.isSystemInDarkTheme
+import androidx.compose.material3.*
+import androidx.compose.runtime.*
+import androidx.compose.ui.graphics.toArgb
+import androidx.compose.ui.platform.LocalContext
+import androidx.compose.ui.platform.LocalView
+import androidx.core.view.WindowCompat
+
+private val DarkColorScheme = darkColorScheme(primary = Purple80, secondary = PurpleGrey80, tertiary = Pink80)
+private val LightColorScheme = lightColorScheme(primary = Purple40, secondary = PurpleGrey40, tertiary = Pink40)
+
+@Composable
+'''
+
+THEME_THEME_BODY = '''(darkTheme: Boolean = isSystemInDarkTheme(), dynamicColor: Boolean = true, content: @Composable () -> Unit) {
+    val colorScheme = when {
+        dynamicColor && Build.VERSION.SDK_INT >= Build.VERSION_CODES.S -> {
+            val context = LocalContext.current
+            if (darkTheme) dynamicDarkColorScheme(context) else dynamicLightColorScheme(context)
+        }
+        darkTheme -> DarkColorScheme
+        else -> LightColorScheme
+    }
+    val view = LocalView.current
+    if (!view.isInEditMode) {
+        SideEffect {
+            val window = (view.context as Activity).window
+            window.statusBarColor = colorScheme.primary.toArgb()
+            WindowCompat.getInsetsController(window, view).isAppearanceLightStatusBars = darkTheme
+        }
+    }
+    MaterialTheme(colorScheme = colorScheme, typography = Typography, content = content)
+}
+'''
+
+
 def create_directory_structure(config: ConversionConfig) -> None:
     """Create the Android project directory structure."""
     android = config.android_path
-    pkg_path = config.package_name.replace('.', '/')
+    java_root = config.java_root
     
     directories = [
-        android / "app" / "src" / "main" / "java" / pkg_path / "model",
-        android / "app" / "src" / "main" / "java" / pkg_path / "ui" / "theme",
-        android / "app" / "src" / "main" / "java" / pkg_path / "ui" / "screens",
-        android / "app" / "src" / "main" / "java" / pkg_path / "ui" / "components",
-        android / "app" / "src" / "main" / "java" / pkg_path / "viewmodel",
-        android / "app" / "src" / "main" / "java" / pkg_path / "data" / "repository",
-        android / "app" / "src" / "main" / "java" / pkg_path / "data" / "remote",
-        android / "app" / "src" / "main" / "java" / pkg_path / "data" / "local",
-        android / "app" / "src" / "main" / "java" / pkg_path / "di",
-        android / "app" / "src" / "main" / "java" / pkg_path / "util",
-        android / "app" / "src" / "main" / "res" / "values",
-        android / "app" / "src" / "main" / "res" / "mipmap-hdpi",
-        android / "app" / "src" / "test" / "java" / pkg_path,
-        android / "app" / "src" / "androidTest" / "java" / pkg_path,
+        *(java_root / sub for sub in (
+            "model", "ui/theme", "ui/screens", "ui/components", "viewmodel",
+            "data/repository", "data/remote", "data/local", "di", "util",
+        )),
+        config.res_root / "values",
+        config.res_root / "mipmap-hdpi",
+        android / "app" / "src" / "test" / "java" / config.pkg_path,
+        android / "app" / "src" / "androidTest" / "java" / config.pkg_path,
         android / "gradle" / "wrapper",
     ]
+    if not config.use_compose:
+        directories.append(config.res_root / "layout")
     
+    # The directories share long prefixes; collect each missing ancestor once
+    # and create them shallowest first instead of re-walking every chain
+    needed = set()
     for d in directories:
-        d.mkdir(parents=True, exist_ok=True)
+        while d not in needed and not d.exists():
+            needed.add(d)
+            d = d.parent
+    
+    for d in sorted(needed, key=lambda p: len(p.parts)):
+        d.mkdir(exist_ok=True)
 
 
-def create_gradle_files(config: ConversionConfig, project_name: str) -> None:
-    """Create Gradle build files."""
-    android = config.android_path
-    
-    hilt_plugin_project = HILT_PLUGIN_PROJECT if config.di_framework == "hilt" else ""
-    hilt_plugin_app = HILT_PLUGIN_APP if config.di_framework == "hilt" else 'id("com.google.devtools.ksp") version "1.9.21-1.0.15"'
+def _write(path: Path, data: str) -> None:
+    """Write text as UTF-8, encoding it in one step without a text-mode wrapper."""
+    path.write_bytes(data.encode('utf-8'))
+
+
+def write_files(writes: list) -> None:
+    """Write staged (path, content) pairs, overlapping the file I/O on threads."""
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in executor.map(lambda item: _write(*item), writes):
+            pass
+
+
+@lru_cache(maxsize=None)
+def _project_gradle(di_framework: str) -> str:
+    """Render the top-level build.gradle.kts."""
+    hilt_plugin = HILT_PLUGIN_PROJECT if di_framework == "hilt" else ""
+    return BUILD_GRADLE_PROJECT.format(hilt_plugin=hilt_plugin)
+
+
+@lru_cache(maxsize=None)
+def _app_gradle(di_framework: str, use_compose: bool, package_name: str,
+                min_sdk: int, target_sdk: int) -> str:
+    """Render app/build.gradle.kts."""
+    hilt_plugin = HILT_PLUGIN_APP if di_framework == "hilt" else 'id("com.google.devtools.ksp") version "1.9.21-1.0.15"'
     
-    if config.di_framework == "hilt":
+    if di_framework == "hilt":
         di_deps = HILT_DEPS
-    elif config.di_framework == "koin":
+    elif di_framework == "koin":
         di_deps = KOIN_DEPS
     else:
         di_deps = "// Manual dependency injection"
     
-    compose_config = COMPOSE_CONFIG if config.use_compose else ""
-    compose_deps = COMPOSE_DEPENDENCIES if config.use_compose else ""
-    compose_test = COMPOSE_TEST_DEPS if config.use_compose else ""
-    
-    project_gradle = BUILD_GRADLE_PROJECT.format(hilt_plugin=hilt_plugin_project)
-    (android / "build.gradle.kts").write_text(project_gradle)
-    
-    app_gradle = BUILD_GRADLE_APP.format(
-        package_name=config.package_name,
-        min_sdk=config.min_sdk,
-        target_sdk=config.target_sdk,
-        hilt_plugin=hilt_plugin_app,
-        compose_config=compose_config,
-        compose_dependencies=compose_deps,
+    return BUILD_GRADLE_APP.format(
+        package_name=package_name,
+        min_sdk=min_sdk,
+        target_sdk=target_sdk,
+        hilt_plugin=hilt_plugin,
+        compose_config=COMPOSE_CONFIG if use_compose else "",
+        compose_dependencies=COMPOSE_DEPENDENCIES if use_compose else "",
         di_dependencies=di_deps,
-        compose_test_dependencies=compose_test
+        compose_test_dependencies=COMPOSE_TEST_DEPS if use_compose else ""
     )
-    (android / "app" / "build.gradle.kts").write_text(app_gradle)
+
+
+@lru_cache(maxsize=None)
+def _settings_gradle(project_name: str) -> str:
+    """Render settings.gradle.kts."""
+    return SETTINGS_GRADLE.format(project_name=project_name)
+
+
+def create_gradle_files(config: ConversionConfig, project_name: str, writes: list) -> None:
+    """Stage Gradle build files as (path, content) pairs in writes."""
+    android = config.android_path
+    
+    writes.append((android / "build.gradle.kts", _project_gradle(config.di_framework)))
     
-    settings = SETTINGS_GRADLE.format(project_name=project_name)
-    (android / "settings.gradle.kts").write_text(settings)
+    app_gradle = _app_gradle(config.di_framework, config.use_compose, config.package_name,
+                             config.min_sdk, config.target_sdk)
+    writes.append((android / "app" / "build.gradle.kts", app_gradle))
     
-    (android / "gradle.properties").write_text('''org.gradle.jvmargs=-Xmx2048m -Dfile.encoding=UTF-8
+    writes.append((android / "settings.gradle.kts", _settings_gradle(project_name)))
+    
+    writes.append((android / "gradle.properties", '''org.gradle.jvmargs=-Xmx2048m -Dfile.encoding=UTF-8
 android.useAndroidX=true
 kotlin.code.style=official
 android.nonTransitiveRClass=true
-''')
+'''))
     
-    (android / "app" / "proguard-rules.pro").write_text(f'''# Keep data classes
+    writes.append((android / "app" / "proguard-rules.pro", f'''# Keep data classes
 -keep class {config.package_name}.model.** {{ *; }}
 -keepattributes Signature, InnerClasses, EnclosingMethod
-''')
+'''))
     
-    (android / "gradle" / "wrapper" / "gradle-wrapper.properties").write_text('''distributionBase=GRADLE_USER_HOME
+    writes.append((android / "gradle" / "wrapper" / "gradle-wrapper.properties", '''distributionBase=GRADLE_USER_HOME
 distributionPath=wrapper/dists
 distributionUrl=https\\://services.gradle.org/distributions/gradle-8.2-bin.zip
 zipStoreBase=GRADLE_USER_HOME
 zipStorePath=wrapper/dists
-''')
+'''))
 
 
-def create_android_files(config: ConversionConfig, app_name: str) -> None:
-    """Create Android manifest and core files."""
-    pkg_path = config.package_name.replace('.', '/')
+def create_android_files(config: ConversionConfig, app_name: str, writes: list) -> None:
+    """Stage Android manifest and core files as (path, content) pairs in writes."""
     use_hilt = config.di_framework == "hilt"
+    pkg = config.package_name
+    theme = f"@style/Theme.{app_name}"
     
     # AndroidManifest.xml
-    hilt_app = f'android:name=".{app_name}Application"' if use_hilt else ""
-    manifest = f'''<?xml version="1.0" encoding="utf-8"?>
-<manifest xmlns:android="http://schemas.android.com/apk/res/android">
-    <uses-permission android:name="android.permission.INTERNET" />
-    <application
-        android:allowBackup="true"
-        android:icon="@mipmap/ic_launcher"
-        android:label="@string/app_name"
-        android:roundIcon="@mipmap/ic_launcher_round"
-        android:supportsRtl="true"
-        android:theme="@style/Theme.{app_name}"
-        {hilt_app}>
-        <activity android:name=".MainActivity" android:exported="true" android:theme="@style/Theme.{app_name}">
-            <intent-filter>
-                <action android:name="android.intent.action.MAIN" />
-                <category android:name="android.intent.category.LAUNCHER" />
-            </intent-filter>
-        </activity>
-    </application>
-</manifest>
-'''
-    (config.android_path / "app" / "src" / "main" / "AndroidManifest.xml").write_text(manifest)
+    manifest = "\n".join((
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<manifest xmlns:android="http://schemas.android.com/apk/res/android">',
+        '    <uses-permission android:name="android.permission.INTERNET" />',
+        '    <application',
+        '        android:allowBackup="true"',
+        '        android:icon="@mipmap/ic_launcher"',
+        '        android:label="@string/app_name"',
+        '        android:roundIcon="@mipmap/ic_launcher_round"',
+        '        android:supportsRtl="true"',
+        f'        android:theme="{theme}"',
+        f'        android:name=".{app_name}Application">' if use_hilt else '        >',
+        f'        <activity android:name=".MainActivity" android:exported="true" android:theme="{theme}">',
+        '            <intent-filter>',
+        '                <action android:name="android.intent.action.MAIN" />',
+        '                <category android:name="android.intent.category.LAUNCHER" />',
+        '            </intent-filter>',
+        '        </activity>',
+        '    </application>',
+        '</manifest>',
+        '',
+    ))
+    writes.append((config.main_root / "AndroidManifest.xml", manifest))
     
     # Application class
-    hilt_import = "import dagger.hilt.android.HiltAndroidApp" if use_hilt else ""
-    hilt_annotation = "@HiltAndroidApp" if use_hilt else ""
-    app_class = f'''package {config.package_name}
-
-import android.app.Application
-{hilt_import}
-
-{hilt_annotation}
-class {app_name}Application : Application() {{
-    override fun onCreate() {{
-        super.onCreate()
-    }}
-}}
-'''
-    (config.android_path / "app" / "src" / "main" / "java" / pkg_path / f"{app_name}Application.kt").write_text(app_class)
+    app_class = "\n".join((
+        f'package {pkg}',
+        '',
+        'import android.app.Application',
+        'import dagger.hilt.android.HiltAndroidApp' if use_hilt else '',
+        '',
+        '@HiltAndroidApp' if use_hilt else '',
+        f'class {app_name}Application : Application() {{',
+        '    override fun onCreate() {',
+        '        super.onCreate()',
+        '    }',
+        '}',
+        '',
+    ))
+    writes.append((config.java_root / f"{app_name}Application.kt", app_class))
+    
+    if not config.use_compose:
+        create_view_activity_files(config, app_name, writes)
+        return
     
     # MainActivity
-    hilt_import = "import dagger.hilt.android.AndroidEntryPoint" if use_hilt else ""
-    hilt_annotation = "@AndroidEntryPoint" if use_hilt else ""
-    activity = f'''package {config.package_name}
-
-import android.os.Bundle
-import androidx.activity.ComponentActivity
-import androidx.activity.compose.setContent
-import androidx.compose.foundation.layout.fillMaxSize
-import androidx.compose.material3.MaterialTheme
-import androidx.compose.material3.Surface
-import androidx.compose.ui.Modifier
-import {config.package_name}.ui.theme.{app_name}Theme
-{hilt_import}
-
-{hilt_annotation}
-class MainActivity : ComponentActivity() {{
-    override fun onCreate(savedInstanceState: Bundle?) {{
-        super.onCreate(savedInstanceState)
-        setContent {{
-            {app_name}Theme {{
-                Surface(modifier = Modifier.fillMaxSize(), color = MaterialTheme.colorScheme.background) {{
-                    MainScreen()
-                }}
-            }}
-        }}
-    }}
-}}
-'''
-    (config.android_path / "app" / "src" / "main" / "java" / pkg_path / "MainActivity.kt").write_text(activity)
+    activity = "\n".join((
+        f'package {pkg}',
+        '',
+        'import android.os.Bundle',
+        'import androidx.activity.ComponentActivity',
+        'import androidx.activity.compose.setContent',
+        'import androidx.compose.foundation.layout.fillMaxSize',
+        'import androidx.compose.material3.MaterialTheme',
+        'import androidx.compose.material3.Surface',
+        'import androidx.compose.ui.Modifier',
+        f'import {pkg}.ui.theme.{app_name}Theme',
+        'import dagger.hilt.android.AndroidEntryPoint' if use_hilt else '',
+        '',
+        '@AndroidEntryPoint' if use_hilt else '',
+        'class MainActivity : ComponentActivity() {',
+        '    override fun onCreate(savedInstanceState: Bundle?) {',
+        '        super.onCreate(savedInstanceState)',
+        '        setContent {',
+        f'            {app_name}Theme {{',
+        '                Surface(modifier = Modifier.fillMaxSize(), color = MaterialTheme.colorScheme.background) {',
+        '                    MainScreen()',
+        '                }',
+        '            }',
+        '        }',
+        '    }',
+        '}',
+        '',
+    ))
+    writes.append((config.java_root / "MainActivity.kt", activity))
     
     # MainScreen
     main_screen = f'''package {config.package_name}
@@ -317,180 +431,345 @@ fun MainScreen() {{
     }}
 }}
 '''
-    (config.android_path / "app" / "src" / "main" / "java" / pkg_path / "MainScreen.kt").write_text(main_screen)
+    writes.append((config.java_root / "MainScreen.kt", main_screen))
 
 
-def create_theme_files(config: ConversionConfig, app_name: str) -> None:
-    """Create Compose theme files."""
-    pkg_path = config.package_name.replace('.', '/')
-    theme_path = config.android_path / "app" / "src" / "main" / "java" / pkg_path / "ui" / "theme"
+def create_view_activity_files(config: ConversionConfig, app_name: str, writes: list) -> None:
+    """Stage a layout-based MainActivity and its XML layout for non-Compose projects."""
+    use_hilt = config.di_framework == "hilt"
     
-    (theme_path / "Color.kt").write_text(f'''package {config.package_name}.ui.theme
-
-import androidx.compose.ui.graphics.Color
-
-val Purple80 = Color(0xFFD0BCFF)
-val PurpleGrey80 = Color(0xFFCCC2DC)
-val Pink80 = Color(0xFFEFB8C8)
-val Purple40 = Color(0xFF6650a4)
-val PurpleGrey40 = Color(0xFF625b71)
-val Pink40 = Color(0xFF7D5260)
-''')
+    activity = "\n".join((
+        f'package {config.package_name}',
+        '',
+        'import android.os.Bundle',
+        'import androidx.activity.ComponentActivity',
+        'import dagger.hilt.android.AndroidEntryPoint' if use_hilt else '',
+        '',
+        '@AndroidEntryPoint' if use_hilt else '',
+        'class MainActivity : ComponentActivity() {',
+        '    override fun onCreate(savedInstanceState: Bundle?) {',
+        '        super.onCreate(savedInstanceState)',
+        '        setContentView(R.layout.activity_main)',
+        '    }',
+        '}',
+        '',
+    ))
+    writes.append((config.java_root / "MainActivity.kt", activity))
+    
+    layout = "\n".join((
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<LinearLayout xmlns:android="http://schemas.android.com/apk/res/android"',
+        '    android:layout_width="match_parent"',
+        '    android:layout_height="match_parent"',
+        '    android:gravity="center"',
+        '    android:orientation="vertical"',
+        '    android:padding="16dp">',
+        '',
+        '    <TextView',
+        '        android:layout_width="wrap_content"',
+        '        android:layout_height="wrap_content"',
+        f'        android:text="Welcome to {app_name}"',
+        '        android:textAppearance="?android:attr/textAppearanceLarge" />',
+        '',
+        '    <TextView',
+        '        android:layout_width="wrap_content"',
+        '        android:layout_height="wrap_content"',
+        '        android:layout_marginTop="16dp"',
+        '        android:text="Converted from iOS"',
+        '        android:textAppearance="?android:attr/textAppearanceMedium" />',
+        '</LinearLayout>',
+        '',
+    ))
+    writes.append((config.res_root / "layout" / "activity_main.xml", layout))
+
+
+def create_theme_files(config: ConversionConfig, app_name: str, writes: list) -> None:
+    """Stage Compose theme files as (path, content) pairs in writes."""
+    theme_path = config.java_root / "ui" / "theme"
+    header = f"package {config.package_name}.ui.theme\n\n"
+    
+    writes.append((theme_path / "Color.kt", header + THEME_COLOR_BODY))
+    writes.append((theme_path / "Type.kt", header + THEME_TYPE_BODY))
+    writes.append((theme_path / "Theme.kt", "".join((
+        header, THEME_THEME_IMPORTS,
+        f"fun {app_name}Theme", THEME_THEME_BODY,
+    ))))
+
+
+def create_resource_files(config: ConversionConfig, app_name: str, writes: list) -> None:
+    """Stage resource files as (path, content) pairs in writes."""
+    res_path = config.res_root
+    
+    writes.append((res_path / "values" / "strings.xml", f'''<resources>
+    <string name="app_name">{app_name}</string>
+</resources>
+'''))
     
-    (theme_path / "Type.kt").write_text(f'''package {config.package_name}.ui.theme
+    writes.append((res_path / "values" / "themes.xml", f'''<resources xmlns:tools="http://schemas.android.com/tools">
+    <style name="Theme.{app_name}" parent="android:Theme.Material.Light.NoActionBar" />
+</resources>
+'''))
+
+
+# Swift -> Kotlin rewrites, fused into a single alternation so each file is
+# scanned once. Fixed tokens map through _REPLACEMENTS; the remaining groups
+# capture a name and are rewritten in _rewrite_swift_token. Comments and
+# string literals are matched first so the token rules never apply inside
+# them; only string interpolations are rewritten. A member followed by a
+# bracketed name, or a return type running into print( or an import, is
+# left for the rules that ran before it when these were separate passes.
+_REPLACEMENTS = {
+    'let': 'val', 'func': 'fun', 'nil': 'null', 'self': 'this',
+    'struct': 'data class', 'enum': 'enum class', 'protocol': 'interface',
+    'Bool': 'Boolean',
+    '.count': '.size', '.isEmpty': '.isEmpty()', '.first': '.firstOrNull()',
+    '??': '?:', '-> Void': ': Unit', '.append(': '.add(', 'print(': 'println(',
+    'import Foundation': '// import Foundation',
+    'import UIKit': '// import UIKit',
+    'import SwiftUI': '// import SwiftUI - use Compose',
+    'import Combine': '// import Combine - use Flow',
+}
+
+_SWIFT_TO_KOTLIN_RE = re.compile(
+    r'(?P<comment>//[^\n]*|/\*[\s\S]*?\*/)'
+    r'|(?P<string>"""[\s\S]*?"""|"(?:[^"\\\n]|\\\([^)\n]*\)|\\.)*")'
+    r'|(?P<word>\b(?:let|func|nil|self|struct|enum|protocol|Bool)\b)'
+    r'|(?P<member>\.(?:count|isEmpty|first)\b(?!\[(?!(?:struct|enum)\])\w+\]))'
+    r'|(?P<literal>\?\?|-> Void|\.append\(|print\(|import (?:Foundation|UIKit|SwiftUI|Combine))'
+    r'|-> (?:(?P<ret_prefix>\w*?)(?=print\(|import (?:Foundation|UIKit|SwiftUI|Combine))'
+    r'|(?P<ret>\w+)|\[(?P<ret_list>\w+)\])'
+    r'|\[(?P<list>\w+)\]'
+)
 
-import androidx.compose.material3.Typography
-import androidx.compose.ui.text.TextStyle
-import androidx.compose.ui.text.font.FontFamily
-import androidx.compose.ui.text.font.FontWeight
-import androidx.compose.ui.unit.sp
+_INTERPOLATION_RE = re.compile(r'\\\(([^)]+)\)')
+
+
+def _list_type(name: str) -> str:
+    """Render a Swift [Element] array type as a Kotlin List<Element>."""
+    element = _REPLACEMENTS.get(name, name)
+    # Multi-word replacements (e.g. 'data class') aren't type names
+    return f'[{element}]' if ' ' in element else f'List<{element}>'
+
+
+def _rewrite_swift_token(m: re.Match) -> str:
+    """Return the Kotlin replacement for one _SWIFT_TO_KOTLIN_RE match."""
+    kind = m.lastgroup
+    if kind == 'ret':
+        return ': ' + _REPLACEMENTS.get(m.group('ret'), m.group('ret'))
+    if kind == 'ret_prefix':
+        # A return type running into print( or an import (e.g. "-> reprint("):
+        # leave those to their own rule
+        return ': ' + m.group('ret_prefix')
+    if kind == 'ret_list':
+        element = _list_type(m.group('ret_list'))
+        return ('-> ' if element.startswith('[') else ': ') + element
+    if kind == 'list':
+        return _list_type(m.group('list'))
+    if kind == 'comment':
+        return m.group()
+    if kind == 'string':
+        return _INTERPOLATION_RE.sub(_rewrite_interpolation, m.group())
+    return _REPLACEMENTS[m.group()]
+
+
+def _rewrite_interpolation(m: re.Match) -> str:
+    """Turn a Swift \\(expr) interpolation into Kotlin ${expr}."""
+    # Interpolated expressions get the same rewrites as the code around them
+    return '${' + _SWIFT_TO_KOTLIN_RE.sub(_rewrite_swift_token, m.group(1)) + '}'
+
+# TODO markers prepended for the first property wrapper found, with the
+# literal each pattern needs so absent wrappers cost only a substring check
+_MARKER_RES = tuple((literal, re.compile(re.escape(literal) + r'\b'), marker) for literal, marker in [
+    ('@Published', '// TODO: VERIFY - Convert to MutableStateFlow'),
+    ('@State', '// TODO: VERIFY - Convert to remember { mutableStateOf() }'),
+    ('@ObservedObject', '// TODO: VERIFY - Convert to viewModel()'),
+])
 
-val Typography = Typography(
-    bodyLarge = TextStyle(fontFamily = FontFamily.Default, fontWeight = FontWeight.Normal, fontSize = 16.sp, lineHeight = 24.sp, letterSpacing = 0.5.sp)
-)
-''')
-    
-    (theme_path / "Theme.kt").write_text(f'''package {config.package_name}.ui.theme
 
-import android.app.Activity
-import android.os.Build
-import androidx.compose.foundation.isSystemInDarkTheme
-import androidx.compose.material3.*
-import androidx.compose.runtime.*
-import androidx.compose.ui.graphics.toArgb
-import androidx.compose.ui.platform.LocalContext
-import androidx.compose.ui.platform.LocalView
-import androidx.core.view.WindowCompat
+def convert_swift_to_kotlin(swift_content: str, filename: str) -> str:
+    """Convert Swift code to Kotlin (basic conversion)."""
+    kotlin = _SWIFT_TO_KOTLIN_RE.sub(_rewrite_swift_token, swift_content)
+    
+    # Add TODO markers; every wrapper starts with '@', so most files skip the loop
+    if '@' in kotlin:
+        for literal, pattern, marker in _MARKER_RES:
+            if literal in kotlin and pattern.search(kotlin):
+                kotlin = marker + '\n' + kotlin
+                break
+    
+    return kotlin
 
-private val DarkColorScheme = darkColorScheme(primary = Purple80, secondary = PurpleGrey80, tertiary = Pink80)
-private val LightColorScheme = lightColorScheme(primary = Purple40, secondary = PurpleGrey40, tertiary = Pink40)
 
-@Composable
-fun {app_name}Theme(darkTheme: Boolean = isSystemInDarkTheme(), dynamicColor: Boolean = true, content: @Composable () -> Unit) {{
-    val colorScheme = when {{
-        dynamicColor && Build.VERSION.SDK_INT >= Build.VERSION_CODES.S -> {{
-            val context = LocalContext.current
-            if (darkTheme) dynamicDarkColorScheme(context) else dynamicLightColorScheme(context)
-        }}
-        darkTheme -> DarkColorScheme
-        else -> LightColorScheme
-    }}
-    val view = LocalView.current
-    if (!view.isInEditMode) {{
-        SideEffect {{
-            val window = (view.context as Activity).window
-            window.statusBarColor = colorScheme.primary.toArgb()
-            WindowCompat.getInsetsController(window, view).isAppearanceLightStatusBars = darkTheme
-        }}
-    }}
-    MaterialTheme(colorScheme = colorScheme, typography = Typography, content = content)
-}}
-''')
+def _load_sibling_script(name: str):
+    """Import a script from this directory as a module."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, Path(__file__).parent / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    # Registered before executing so worker processes can unpickle its functions
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_analysis(ios_path: Path, use_subprocess: bool = False) -> dict:
+    """Run the iOS analyzer.
+    
+    The analyzer is imported and called in-process by default; use_subprocess
+    runs it as a separate interpreter instead, for isolation. Returns an
+    empty analysis if the project can't be read; anything else the analyzer
+    raises is a bug and propagates.
+    """
+    if use_subprocess:
+        import subprocess
+        analyze_script = Path(__file__).parent / "analyze_ios.py"
+        result = subprocess.run(["python3", str(analyze_script), str(ios_path)], capture_output=True, text=True)
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            return {}
+        try:
+            return json.loads(result.stdout)
+        except json.JSONDecodeError:
+            return {}
+    
+    analyze_ios = _load_sibling_script("analyze_ios")
+    try:
+        return asdict(analyze_ios.analyze_project(str(ios_path)))
+    except OSError as e:
+        print(f"Warning: iOS analysis failed: {e}", file=sys.stderr)
+        return {}
 
 
-def create_resource_files(config: ConversionConfig, app_name: str) -> None:
-    """Create resource files."""
-    res_path = config.android_path / "app" / "src" / "main" / "res"
+def discover_source_files(ios_path: Path) -> dict:
+    """Find model and view model sources without running the full analyzer.
     
-    (res_path / "values" / "strings.xml").write_text(f'''<resources>
-    <string name="app_name">{app_name}</string>
-</resources>
-''')
+    Walks the tree with the analyzer's scandir walker and types each file
+    with its classify_swift_file, which applies the analyzer's rules but
+    skips the declaration scan. Returns the model_files/viewmodel_files
+    subset of an analysis.
+    """
+    analyze_ios = _load_sibling_script("analyze_ios")
+    categories = {'model': 'model_files', 'viewmodel': 'viewmodel_files'}
+    sources = {'model_files': [], 'viewmodel_files': []}
     
-    (res_path / "values" / "themes.xml").write_text(f'''<resources xmlns:tools="http://schemas.android.com/tools">
-    <style name="Theme.{app_name}" parent="android:Theme.Material.Light.NoActionBar" />
-</resources>
-''')
+    for path in analyze_ios.iter_swift_files(os.fspath(ios_path)):
+        try:
+            sf = analyze_ios.classify_swift_file(Path(path), ios_path)
+        except OSError as e:
+            print(f"Warning: Could not analyze {path}: {e}", file=sys.stderr)
+            continue
+        if sf.type in categories:
+            sources[categories[sf.type]].append({'path': sf.path, 'name': sf.name})
+    
+    return sources
 
 
-def convert_swift_to_kotlin(swift_content: str, filename: str) -> str:
-    """Convert Swift code to Kotlin (basic conversion)."""
-    kotlin = swift_content
-    
-    replacements = [
-        (r'\blet\b', 'val'), (r'\bvar\b', 'var'), (r'\bfunc\b', 'fun'),
-        (r'\bnil\b', 'null'), (r'\bself\b', 'this'), (r'\bstruct\b', 'data class'),
-        (r'\benum\b', 'enum class'), (r'\bprotocol\b', 'interface'),
-        (r'\bBool\b', 'Boolean'), (r'\[(\w+)\]', r'List<\1>'),
-        (r'\?\?', '?:'), (r'-> Void', ': Unit'), (r'-> (\w+)', r': \1'),
-        (r'\\\(([^)]+)\)', r'${\1}'), (r'\.count\b', '.size'),
-        (r'\.isEmpty\b', '.isEmpty()'), (r'\.append\(', '.add('),
-        (r'\.first\b', '.firstOrNull()'), (r'print\(', 'println('),
-        (r'import Foundation', '// import Foundation'),
-        (r'import UIKit', '// import UIKit'),
-        (r'import SwiftUI', '// import SwiftUI - use Compose'),
-        (r'import Combine', '// import Combine - use Flow'),
-    ]
+def _convert_file(config: ConversionConfig, sync, swift_path: Path, kotlin_path: Path,
+                  subdir: str, name: str, old_entry) -> Optional[list]:
+    """Convert one Swift file and write it out.
+    
+    sync is the sync_projects module, whose helpers compute fingerprints.
+    Returns the source's sync-state fingerprint, or None if the source is
+    gone. Conversion is skipped when the source still matches old_entry and
+    the target exists; a matching size and mtime skip even reading it.
+    """
+    try:
+        st = swift_path.stat()
+    except FileNotFoundError:
+        return None
+    target_exists = kotlin_path.exists()
+    if old_entry is not None and target_exists and sync.fingerprint_current(old_entry, st):
+        return old_entry
     
-    for pattern, replacement in replacements:
-        kotlin = re.sub(pattern, replacement, kotlin)
+    try:
+        data = swift_path.read_bytes()
+    except FileNotFoundError:
+        return None
     
-    # Add TODO markers
-    markers = [
-        (r'@Published\b', '// TODO: VERIFY - Convert to MutableStateFlow'),
-        (r'@State\b', '// TODO: VERIFY - Convert to remember { mutableStateOf() }'),
-        (r'@ObservedObject\b', '// TODO: VERIFY - Convert to viewModel()'),
-    ]
+    checksum = sync.get_content_checksum(data)
+    fingerprint = sync.make_fingerprint(st, checksum)
+    if old_entry is not None and target_exists and sync.fingerprint_checksum(old_entry) == checksum:
+        return fingerprint
     
-    for pattern, marker in markers:
-        if re.search(pattern, kotlin):
-            kotlin = marker + '\n' + kotlin
-            break
+    swift_content = data.decode('utf-8', 'ignore')
+    kotlin_content = convert_swift_to_kotlin(swift_content, name)
+    kotlin_content = f"package {config.package_name}.{subdir}\n\n" + kotlin_content
     
-    return kotlin
+    _write(kotlin_path, kotlin_content)
+    return fingerprint
 
 
-def run_analysis(ios_path: Path) -> dict:
-    """Run the iOS analyzer."""
-    import subprocess
-    script_dir = Path(__file__).parent
-    analyze_script = script_dir / "analyze_ios.py"
+def load_previous_checksums(config: ConversionConfig) -> dict:
+    """Source fingerprints from an earlier conversion into the same project.
     
-    result = subprocess.run(["python3", str(analyze_script), str(ios_path)], capture_output=True, text=True)
-    if result.returncode != 0:
-        return {}
-    try:
-        return json.loads(result.stdout)
-    except json.JSONDecodeError:
+    Entries are only kept while the package name and the file's target path
+    are unchanged, since either would change the generated Kotlin.
+    """
+    state = _load_sibling_script("sync_projects").load_sync_state(config.android_path)
+    if state is None or state.package_name != config.package_name:
         return {}
+    return {
+        ios_rel: (entry, state.file_mapping.get(ios_rel))
+        for ios_rel, entry in state.checksums.items()
+    }
 
 
-def convert_source_files(config: ConversionConfig, analysis: dict) -> dict:
-    """Convert source files from Swift to Kotlin."""
-    file_mapping = {}
-    pkg_path = config.package_name.replace('.', '/')
+def convert_source_files(config: ConversionConfig, analysis: dict,
+                         previous: Optional[dict] = None) -> tuple[dict, dict]:
+    """Convert source files from Swift to Kotlin.
     
+    previous maps iOS paths to (fingerprint, android_path) pairs from the last
+    run; unchanged files are not converted again. Returns the file mapping and
+    the source fingerprints.
+    """
+    previous = previous or {}
+    # Loaded up front rather than from the worker threads
+    sync = _load_sibling_script("sync_projects")
+    tasks = []
     for category, subdir in [('model_files', 'model'), ('viewmodel_files', 'viewmodel')]:
-        target_dir = config.android_path / "app" / "src" / "main" / "java" / pkg_path / subdir
+        target_dir = config.java_root / subdir
         
         for file_info in analysis.get(category, []):
             swift_path = config.ios_path / file_info['path']
-            if not swift_path.exists():
-                continue
-            
-            swift_content = swift_path.read_text(errors='ignore')
-            kotlin_content = convert_swift_to_kotlin(swift_content, file_info['name'])
-            kotlin_content = f"package {config.package_name}.{subdir}\n\n" + kotlin_content
-            
             kotlin_path = target_dir / (file_info['name'] + ".kt")
-            kotlin_path.write_text(kotlin_content)
-            file_mapping[file_info['path']] = str(kotlin_path.relative_to(config.android_path))
+            tasks.append((file_info['path'], swift_path, kotlin_path, subdir, file_info['name']))
+    
+    # Files convert independently; spread larger batches across threads
+    def convert(task):
+        ios_rel, swift_path, kotlin_path, subdir, name = task
+        old_entry, old_target = previous.get(ios_rel, (None, None))
+        if old_target != str(kotlin_path.relative_to(config.android_path)):
+            old_entry = None
+        return _convert_file(config, sync, swift_path, kotlin_path, subdir, name, old_entry)
+    
+    if len(tasks) < PARALLEL_MIN_FILES:
+        results = [convert(task) for task in tasks]
+    else:
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            results = list(executor.map(convert, tasks))
     
-    return file_mapping
+    file_mapping = {}
+    checksums = {}
+    for (ios_rel, _, kotlin_path, _, _), fingerprint in zip(tasks, results):
+        if fingerprint is not None:
+            file_mapping[ios_rel] = str(kotlin_path.relative_to(config.android_path))
+            checksums[ios_rel] = fingerprint
+    
+    return file_mapping, checksums
 
 
-def create_sync_state(config: ConversionConfig, file_mapping: dict) -> None:
+def create_sync_state(config: ConversionConfig, file_mapping: dict, checksums: dict) -> None:
     """Create sync state file."""
-    sync_state = {
-        "lastSyncDate": datetime.now().isoformat(),
-        "iosCommit": None,
-        "iosPath": str(config.ios_path),
-        "androidPath": str(config.android_path),
-        "packageName": config.package_name,
-        "fileMapping": file_mapping,
-        "checksums": {}
-    }
-    (config.android_path / ".ios-android-sync.json").write_text(json.dumps(sync_state, indent=2))
+    sync = _load_sibling_script("sync_projects")
+    sync.save_sync_state(config.android_path, sync.SyncState(
+        last_sync_date=datetime.now(timezone.utc).isoformat(),
+        ios_commit=None,
+        ios_path=os.fspath(config.ios_path),
+        android_path=os.fspath(config.android_path),
+        package_name=config.package_name,
+        file_mapping=file_mapping,
+        checksums=checksums
+    ))
 
 
 def main():
@@ -500,8 +779,13 @@ def main():
     parser.add_argument("--package", required=True, help="Android package name")
     parser.add_argument("--min-sdk", type=int, default=24, help="Minimum SDK version")
     parser.add_argument("--compose", action="store_true", default=True)
-    parser.add_argument("--xml-views", action="store_true")
+    parser.add_argument("--xml-views", "--no-compose", action="store_true",
+                        help="Generate a layout-based activity and skip Compose files")
     parser.add_argument("--di", choices=["hilt", "koin", "manual"], default="hilt")
+    parser.add_argument("--subprocess-analysis", action="store_true",
+                        help="Run analyze_ios.py in a separate process")
+    parser.add_argument("--skip-analysis", action="store_true",
+                        help="Find sources to convert directly instead of running the full analyzer")
     
     args = parser.parse_args()
     
@@ -522,21 +806,32 @@ def main():
     print(f"Converting: {ios_path} -> {android_path}")
     print(f"Package: {args.package}, App: {app_name}\n")
     
-    print("Analyzing iOS project...")
-    analysis = run_analysis(ios_path)
-    if analysis:
-        print(f"  Files: {analysis.get('total_swift_files', 0)}, Arch: {analysis.get('architecture_pattern', '?')}\n")
+    analysis = {}
+    if not args.skip_analysis:
+        print("Analyzing iOS project...")
+        analysis = run_analysis(ios_path, use_subprocess=args.subprocess_analysis)
+        if analysis:
+            print(f"  Files: {analysis.get('total_swift_files', 0)}, Arch: {analysis.get('architecture_pattern', '?')}\n")
+        else:
+            print("  Analysis failed; finding sources directly\n")
+    
+    previous = load_previous_checksums(config)
     
     print("Creating Android project...")
     create_directory_structure(config)
-    create_gradle_files(config, app_name)
-    create_android_files(config, app_name)
-    create_theme_files(config, app_name)
-    create_resource_files(config, app_name)
+    writes = []
+    create_gradle_files(config, app_name, writes)
+    create_android_files(config, app_name, writes)
+    if config.use_compose:
+        create_theme_files(config, app_name, writes)
+    create_resource_files(config, app_name, writes)
+    write_files(writes)
     
     print("Converting source files...")
-    file_mapping = convert_source_files(config, analysis) if analysis else {}
-    create_sync_state(config, file_mapping)
+    # Without an analysis (skipped or failed), find the sources directly
+    sources = analysis or discover_source_files(ios_path)
+    file_mapping, checksums = convert_source_files(config, sources, previous)
+    create_sync_state(config, file_mapping, checksums)
     
     print(f"\n{'='*50}")
     print("Conversion complete!")
@@ -4,17 +4,68 @@ Sync iOS Swift changes to existing Android Kotlin project.
 Detects changes since last sync and applies incremental updates.
 """
 
+import io
 import os
 import sys
+import re
 import json
+import struct
 import hashlib
 import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager, redirect_stdout
+from itertools import repeat
 from pathlib import Path
-from datetime import datetime
-from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime, timezone
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
 import subprocess
 
+# Below this many files, hashing serially beats thread pool overhead
+PARALLEL_MIN_FILES = 16
+
+# Below this many files to convert, worker process startup outweighs the
+# parallel regex conversion
+PROCESS_MIN_FILES = 64
+
+# Read size when hashing without hashlib.file_digest
+HASH_CHUNK = io.DEFAULT_BUFFER_SIZE * 16
+
+# Dependency and build directories never synced
+EXCLUDED_DIRS = frozenset({'Pods', 'Carthage', 'build', '.build', 'DerivedData'})
+
+# Checksums are tagged with their algorithm. Untagged ones are the MD5
+# digests written by earlier versions and stay valid until next rewritten.
+CHECKSUM_PREFIX = 'b2:'
+
+# Stands in for a checksum that was lost; it matches no file, so the file
+# counts as modified and existing Android code gets conflict markers
+UNKNOWN_CHECKSUM = CHECKSUM_PREFIX
+
+# The checksum table lives in a binary sidecar next to the JSON state: a
+# magic header, then per file a record header followed by the UTF-8 path
+CHECKSUMS_FILE = '.ios-android-sync.checksums.bin'
+CHECKSUMS_MAGIC = b'IASC\x01'
+CHECKSUM_RECORD = struct.Struct('<HBQq16s')  # path length, flags, size, mtime_ns, digest
+CHECKSUM_HAS_STAT = 1  # a [size, mtime_ns, checksum] fingerprint, not a bare checksum
+CHECKSUM_LEGACY = 2  # an untagged MD5 digest from earlier versions
+
+# Conflict markers written around existing (local) and incoming Kotlin code
+CONFLICT_HEADER = b"""// <<<<<<< ANDROID (local)
+// The following is the existing Android code.
+// Review and merge with the iOS changes below.
+// =======
+
+"""
+CONFLICT_SEPARATOR = b"""
+
+// >>>>>>> iOS (incoming)
+// The following is the converted iOS code.
+// =======
+
+"""
+CONFLICT_FOOTER = b"\n"
+
 
 @dataclass
 class FileChange:
@@ -23,6 +74,7 @@ class FileChange:
     change_type: str  # added, modified, deleted
     old_checksum: Optional[str]
     new_checksum: Optional[str]
+    new_fingerprint: Optional[list] = None  # stored in SyncState.checksums
 
 
 @dataclass  
@@ -33,7 +85,10 @@ class SyncState:
     android_path: str
     package_name: str
     file_mapping: dict
-    checksums: dict
+    checksums: dict  # path -> [size, mtime_ns, checksum], or a bare checksum
+    classifications: dict = field(default_factory=dict)  # checksum -> content_kind()
+    dirty_files: Optional[list] = None  # changed or untracked in git at the last sync
+    ignored_files: list = field(default_factory=list)  # synced files git doesn't list
 
 
 def load_sync_state(android_path: Path) -> Optional[SyncState]:
@@ -43,22 +98,142 @@ def load_sync_state(android_path: Path) -> Optional[SyncState]:
         return None
     
     try:
-        data = json.loads(sync_file.read_text())
+        # json.loads takes the raw bytes, skipping a separate decode to str
+        data = json.loads(sync_file.read_bytes())
+        file_mapping = data.get('fileMapping', {})
+        dirty_files = data.get('dirtyFiles')
+        if 'checksums' in data:
+            checksums = data['checksums']
+        else:
+            checksums = _load_checksums(android_path, data.get('checksumsDigest'))
+            if checksums is None:
+                print("Warning: checksum table missing or out of date; "
+                      "treating every converted file as modified", file=sys.stderr)
+                checksums = {ios_rel: UNKNOWN_CHECKSUM for ios_rel in file_mapping}
+                # Every file needs checking, so no git shortcut
+                dirty_files = None
         return SyncState(
             last_sync_date=data.get('lastSyncDate', ''),
             ios_commit=data.get('iosCommit'),
             ios_path=data.get('iosPath', ''),
             android_path=data.get('androidPath', ''),
             package_name=data.get('packageName', ''),
-            file_mapping=data.get('fileMapping', {}),
-            checksums=data.get('checksums', {})
+            file_mapping=file_mapping,
+            checksums=checksums,
+            classifications=data.get('classifications', {}),
+            dirty_files=dirty_files,
+            ignored_files=data.get('ignoredFiles', [])
         )
-    except (json.JSONDecodeError, KeyError):
+    except (ValueError, KeyError):
+        # JSONDecodeError, or UnicodeDecodeError for a file that isn't UTF-8
+        return None
+
+
+def _pack_checksums(checksums: dict) -> Optional[bytes]:
+    """Encode a checksum table in the sidecar format.
+    
+    Returns None for entries the format can't hold (paths that aren't valid
+    UTF-8 or over 64 KiB, unexpected checksum strings).
+    """
+    pack = CHECKSUM_RECORD.pack
+    parts = [CHECKSUMS_MAGIC]
+    try:
+        for path, entry in checksums.items():
+            if isinstance(entry, str):
+                flags, size, mtime_ns, checksum = 0, 0, 0, entry
+            else:
+                flags = CHECKSUM_HAS_STAT
+                size, mtime_ns, checksum = entry
+            if checksum.startswith(CHECKSUM_PREFIX):
+                checksum = checksum[len(CHECKSUM_PREFIX):]
+            else:
+                flags |= CHECKSUM_LEGACY
+            digest = bytes.fromhex(checksum)
+            if len(digest) != 16:
+                return None
+            path_bytes = path.encode('utf-8')
+            parts.append(pack(len(path_bytes), flags, size, mtime_ns, digest))
+            parts.append(path_bytes)
+    except (ValueError, TypeError, struct.error):
+        return None
+    return b''.join(parts)
+
+
+def _unpack_checksums(blob: bytes) -> Optional[dict]:
+    """Decode a checksum table written by _pack_checksums; None if malformed."""
+    if not blob.startswith(CHECKSUMS_MAGIC):
+        return None
+    # Records vary in length with their paths, so struct.iter_unpack can't
+    # step through them; walk the offsets instead
+    unpack_from = CHECKSUM_RECORD.unpack_from
+    record_size = CHECKSUM_RECORD.size
+    checksums = {}
+    pos = len(CHECKSUMS_MAGIC)
+    try:
+        while pos < len(blob):
+            path_len, flags, size, mtime_ns, digest = unpack_from(blob, pos)
+            pos += record_size
+            path = blob[pos:pos + path_len].decode('utf-8')
+            pos += path_len
+            checksum = digest.hex() if flags & CHECKSUM_LEGACY else CHECKSUM_PREFIX + digest.hex()
+            checksums[path] = [size, mtime_ns, checksum] if flags & CHECKSUM_HAS_STAT else checksum
+    except (struct.error, UnicodeDecodeError):
+        return None
+    if pos != len(blob):
+        return None
+    return checksums
+
+
+def _sidecar_digest(blob: bytes) -> str:
+    """Digest tying a checksums sidecar to the JSON state that was saved with it."""
+    return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+
+def _load_checksums(android_path: Path, expected_digest: Optional[str]) -> Optional[dict]:
+    """Read the checksums sidecar.
+    
+    Returns None for a missing, damaged, or mismatched sidecar (only the
+    JSON was committed or copied, or a save was interrupted between the two
+    files).
+    """
+    try:
+        blob = (android_path / CHECKSUMS_FILE).read_bytes()
+    except FileNotFoundError:
+        return None
+    if expected_digest is None or _sidecar_digest(blob) != expected_digest:
         return None
+    return _unpack_checksums(blob)
+
+
+@contextmanager
+def _atomic_open(path: Path, mode: str, **kwargs):
+    """Open a temporary file that is fsynced and renamed over path on success.
+    
+    An interrupted save never leaves a truncated file behind, and a failed
+    one doesn't leave the temporary file either.
+    """
+    tmp_file = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp_file, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_file)
+        except FileNotFoundError:
+            pass
+        raise
 
 
 def save_sync_state(android_path: Path, state: SyncState) -> None:
-    """Save sync state to Android project."""
+    """Save sync state to Android project.
+    
+    The checksum table, by far the largest part, is written to a binary
+    sidecar rather than the JSON. Tables the sidecar format can't hold stay
+    in the JSON, which load_sync_state also accepts.
+    """
     sync_file = android_path / ".ios-android-sync.json"
     data = {
         'lastSyncDate': state.last_sync_date,
@@ -67,105 +242,392 @@ def save_sync_state(android_path: Path, state: SyncState) -> None:
         'androidPath': state.android_path,
         'packageName': state.package_name,
         'fileMapping': state.file_mapping,
-        'checksums': state.checksums
     }
-    sync_file.write_text(json.dumps(data, indent=2))
+    blob = _pack_checksums(state.checksums)
+    if blob is None:
+        data['checksums'] = state.checksums
+    else:
+        # Written first, so the JSON never points at a sidecar that isn't there
+        with _atomic_open(android_path / CHECKSUMS_FILE, 'wb') as f:
+            f.write(blob)
+        data['checksumsDigest'] = _sidecar_digest(blob)
+    data['classifications'] = state.classifications
+    data['dirtyFiles'] = state.dirty_files
+    data['ignoredFiles'] = state.ignored_files
+    with _atomic_open(sync_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def _new_digest():
+    """Hash object for file fingerprints: BLAKE2b truncated to 128 bits."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def get_content_checksum(data: bytes) -> str:
+    """Calculate the checksum of file contents already in memory."""
+    digest = _new_digest()
+    digest.update(data)
+    return CHECKSUM_PREFIX + digest.hexdigest()
+
+
+def _hash_file(filepath: Path, new_digest) -> Optional[str]:
+    """Stream a file through a hash; None if the file doesn't exist."""
+    try:
+        with open(filepath, 'rb', buffering=0) as f:
+            if hasattr(hashlib, 'file_digest'):
+                return hashlib.file_digest(f, new_digest).hexdigest()
+            # Python < 3.11: reuse one buffer instead of allocating per chunk
+            digest = new_digest()
+            buf = bytearray(HASH_CHUNK)
+            view = memoryview(buf)
+            while n := f.readinto(buf):
+                digest.update(view[:n])
+            return digest.hexdigest()
+    except FileNotFoundError:
+        return None
 
 
 def get_file_checksum(filepath: Path) -> str:
-    """Calculate MD5 checksum of a file."""
-    if not filepath.exists():
-        return ""
-    return hashlib.md5(filepath.read_bytes()).hexdigest()
+    """Calculate the checksum of a file."""
+    digest = _hash_file(filepath, _new_digest)
+    return "" if digest is None else CHECKSUM_PREFIX + digest
+
 
+def checksum_matches(stored: str, checksum: str, filepath: Path) -> bool:
+    """Whether a checksum from the sync state still describes a file.
+    
+    checksum is the file's current checksum. Untagged stored values are MD5
+    digests from older sync states and are checked by re-hashing with MD5.
+    """
+    if stored.startswith(CHECKSUM_PREFIX) or not checksum:
+        return stored == checksum
+    return stored == _hash_file(filepath, hashlib.md5)
+
+
+def make_fingerprint(st: os.stat_result, checksum: str) -> list:
+    """Sync-state entry for a file: [size, mtime_ns, checksum]."""
+    return [st.st_size, st.st_mtime_ns, checksum]
 
-def get_git_commit(path: Path) -> Optional[str]:
-    """Get current git commit hash."""
+
+def fingerprint_checksum(entry) -> str:
+    """The checksum in a sync-state entry.
+    
+    Older states store bare checksum strings rather than fingerprints.
+    """
+    return entry if isinstance(entry, str) else entry[2]
+
+
+def fingerprint_current(entry, st: os.stat_result) -> bool:
+    """Whether a file's size and mtime still match its sync-state entry.
+    
+    A match means the stored checksum can be trusted without hashing the
+    file again. Bare checksums carry no stat data and never match.
+    """
+    return not isinstance(entry, str) and entry[0] == st.st_size and entry[1] == st.st_mtime_ns
+
+
+def _scan_file(filepath: Path, entry) -> Optional[tuple[os.stat_result, Optional[str]]]:
+    """Stat a file and hash it unless its sync-state entry is still current.
+    
+    Returns (stat, checksum), with checksum None when the entry's size and
+    mtime still match, or None if the file is gone.
+    """
     try:
-        result = subprocess.run(
-            ['git', 'rev-parse', 'HEAD'],
-            cwd=path,
-            capture_output=True,
-            text=True
-        )
-        if result.returncode == 0:
-            return result.stdout.strip()
+        st = os.stat(filepath)
     except FileNotFoundError:
-        pass
-    return None
+        return None
+    if entry is not None and fingerprint_current(entry, st):
+        return st, None
+    return st, get_file_checksum(filepath)
+
+
+def scan_files(paths: list[Path], entries: list) -> list:
+    """Run _scan_file over paths in order, overlapping the I/O on a thread pool.
+    
+    Both the stat and the read go through the pool, so slow or networked
+    filesystems see many requests in flight instead of one at a time, and
+    hashing releases the GIL. Small batches are scanned serially.
+    """
+    if len(paths) < PARALLEL_MIN_FILES:
+        return [_scan_file(path, entry) for path, entry in zip(paths, entries)]
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        return list(executor.map(_scan_file, paths, entries))
 
 
-def get_changed_files_git(ios_path: Path, since_commit: str) -> list[str]:
-    """Get files changed since a specific commit using git."""
+def _run_git(path: Path, *args: str) -> Optional[str]:
+    """Run a git command in path and return its stdout, or None on failure."""
     try:
         result = subprocess.run(
-            ['git', 'diff', '--name-only', since_commit, 'HEAD', '--', '*.swift'],
-            cwd=ios_path,
+            ['git', *args],
+            cwd=path,
             capture_output=True,
             text=True
         )
-        if result.returncode == 0:
-            return [f for f in result.stdout.strip().split('\n') if f]
     except FileNotFoundError:
-        pass
-    return []
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+
+def _git_prefix(path: Path) -> Optional[str]:
+    """Get path relative to its git work tree, the way git prefixes it.
+    
+    Found by looking for .git upwards rather than asking git, which would
+    cost another subprocess. Returns None outside a work tree.
+    """
+    path = path.resolve()
+    for top in (path, *path.parents):
+        if (top / '.git').exists():
+            rel = path.relative_to(top).as_posix()
+            return '' if rel == '.' else rel + '/'
+    return None
+
+
+def _parse_git_status(output: str, prefix: str) -> Optional[tuple[str, list[str]]]:
+    """Parse `git status --porcelain=v2 --branch -z` output.
+    
+    Returns the HEAD commit and the paths reported (modified, deleted or
+    untracked), relative to the directory given by prefix. Returns None if
+    there is no commit yet, or if a path falls outside prefix (the work
+    tree wasn't where we looked).
+    """
+    head = None
+    paths = []
+    fields = iter(output.split('\0'))
+    for entry in fields:
+        if entry.startswith('# branch.oid '):
+            head = entry[len('# branch.oid '):]
+            continue
+        if not entry or entry[0] == '#':
+            continue
+        kind = entry[0]
+        if kind == '?':
+            path = entry[2:]
+        elif kind in '12u':
+            # Ordinary entries have 8 fields before the path, renames 9 and
+            # unmerged 10; renames are followed by their original path
+            path = entry.split(' ', {'1': 8, '2': 9, 'u': 10}[kind])[-1]
+            if kind == '2':
+                next(fields, None)
+        else:
+            continue
+        if not path.startswith(prefix):
+            return None
+        paths.append(path[len(prefix):])
+    if head is None or head == '(initial)':
+        return None
+    return head, paths
+
+
+def get_git_status(ios_path: Path) -> Optional[tuple[str, list[str]]]:
+    """Get the HEAD commit and the Swift files that differ from it.
+    
+    A single `git status` call covers staged, unstaged and untracked files
+    (ignored ones aren't reported). Returns None when git can't answer (not
+    a repository, no commits yet, git not installed).
+    """
+    prefix = _git_prefix(ios_path)
+    if prefix is None:
+        return None
+    status = _run_git(ios_path, 'status', '--porcelain=v2', '--branch', '--untracked-files=all',
+                      '--no-renames', '-z', '--', '*.swift')
+    if status is None:
+        return None
+    return _parse_git_status(status, prefix)
+
+
+def get_changed_files_git(ios_path: Path, since_commit: str, head: str,
+                          worktree: list[str]) -> Optional[list[str]]:
+    """Get Swift files that may have changed since a specific commit.
+    
+    head and worktree come from get_git_status. Files committed since
+    since_commit are added to the working tree's changes; `git diff` only
+    runs when HEAD moved. Returns None if git doesn't know the commit.
+    """
+    changed = list(worktree)
+    if head != since_commit:
+        diff = _run_git(ios_path, 'diff', '--name-only', '--no-renames', '--relative', '-z',
+                        since_commit, head, '--', '*.swift')
+        if diff is None:
+            return None
+        changed.extend(path for path in diff.split('\0') if path)
+    return changed
+
+
+def get_swift_files_git(ios_path: Path) -> Optional[list[str]]:
+    """List Swift files from git's index instead of walking the tree.
+    
+    Covers tracked files and untracked ones that aren't ignored, with paths
+    relative to ios_path. Tracked files deleted from the working tree are
+    still listed. Returns None when ios_path isn't in a git checkout.
+    """
+    output = _run_git(ios_path, 'ls-files', '-z', '--cached', '--others', '--exclude-standard', '--', '*.swift')
+    if output is None:
+        return None
+    # Unmerged files have an index entry per conflict stage
+    return list(dict.fromkeys(p for p in output.split('\0') if p))
+
+
+def _is_excluded(rel_path: str) -> bool:
+    """Whether a Swift file lives under a dependency or build directory."""
+    return not EXCLUDED_DIRS.isdisjoint(rel_path.split('/')[:-1])
 
 
-def detect_changes(ios_path: Path, state: SyncState) -> list[FileChange]:
-    """Detect changes in iOS project since last sync."""
+def _walk_swift(root: Path) -> Iterator[str]:
+    """Yield Swift file paths relative to root, pruning excluded directories.
+    
+    Uses os.scandir directly so file types come from the directory entries
+    and excluded trees are never opened.
+    """
+    stack = [('', os.fspath(root))]
+    while stack:
+        prefix, directory = stack.pop()
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in EXCLUDED_DIRS:
+                        stack.append((prefix + entry.name + '/', entry.path))
+                elif entry.name.endswith('.swift'):
+                    yield prefix + entry.name
+
+
+def _diff_checksums(current: dict[str, str], old: dict) -> list[tuple[str, object, str]]:
+    """(path, old entry, new checksum) for each file whose stored entry differs.
+    
+    When every entry is a bare checksum (states from older versions) nearly
+    all files compare equal, so the comparison runs as a single comprehension
+    and only the differing files reach the per-change logic in detect_changes.
+    """
+    old_get = old.get
+    return [(path, old_get(path), checksum) for path, checksum in current.items()
+            if old_get(path) != checksum]
+
+
+def detect_changes(ios_path: Path, state: SyncState,
+                   changed: Optional[list[str]] = None) -> list[FileChange]:
+    """Detect changes in iOS project since last sync.
+    
+    changed holds the paths get_changed_files_git reports for the commit
+    the last sync recorded. Only those files are considered, along with
+    two lists git won't report again: the files it reported at the last
+    sync (state.dirty_files), which may since have been reverted or
+    deleted, and synced files it ignores (state.ignored_files). Without
+    them (the first sync, or no git) every Swift file is considered, listed
+    by git when the project is a checkout and found by walking the tree
+    otherwise. Either way, a file is only hashed if its size or mtime
+    changed since the last sync, and files gone from disk are deleted.
+    """
     changes = []
     
-    # Find all Swift files (excluding Pods, etc.)
-    swift_files = list(ios_path.rglob("*.swift"))
-    swift_files = [f for f in swift_files if not any(
-        x in str(f) for x in ['Pods/', 'Carthage/', 'build/', '.build/', 'DerivedData/']
-    )]
+    if changed is None:
+        # Find all Swift files (excluding Pods, etc.), from git's index when
+        # there is one
+        listed = get_swift_files_git(ios_path)
+        if listed is None:
+            candidates = list(_walk_swift(ios_path))
+            ignored = None
+        else:
+            # Synced files git doesn't list, such as generated sources it
+            # ignores, are checked on disk rather than taken as deleted
+            listed_set = set(listed)
+            ignored = [p for p in state.checksums if p not in listed_set and not _is_excluded(p)]
+            candidates = [p for p in listed if not _is_excluded(p)] + ignored
+    else:
+        ignored = state.ignored_files
+        candidates = [p for p in dict.fromkeys([*changed, *(state.dirty_files or ()), *ignored])
+                      if not _is_excluded(p)]
     
+    # Only files whose size or mtime moved since the last sync are hashed
+    scanned = scan_files([ios_path / p for p in candidates],
+                         [state.checksums.get(p) for p in candidates])
+    stats = {}
     current_files = {}
-    for filepath in swift_files:
-        rel_path = str(filepath.relative_to(ios_path))
-        current_files[rel_path] = get_file_checksum(filepath)
+    for rel_path, result in zip(candidates, scanned):
+        if result is None:
+            continue
+        stats[rel_path], checksum = result
+        if checksum is not None:
+            current_files[rel_path] = checksum
+    
+    if ignored is not None:
+        # Ignored files only drop out of the list once deleted
+        state.ignored_files = [p for p in ignored if p in stats]
+    
+    if changed is None:
+        deleted = [rel_path for rel_path in state.checksums if rel_path not in stats]
+    else:
+        deleted = [rel_path for rel_path in candidates
+                   if rel_path not in stats and rel_path in state.checksums]
     
     # Check for modified and added files
-    for rel_path, checksum in current_files.items():
-        old_checksum = state.checksums.get(rel_path)
+    for rel_path, old_entry, checksum in _diff_checksums(current_files, state.checksums):
         android_path = state.file_mapping.get(rel_path)
+        fingerprint = make_fingerprint(stats[rel_path], checksum)
         
-        if old_checksum is None:
+        if old_entry is None:
             # New file
             changes.append(FileChange(
                 ios_path=rel_path,
                 android_path=None,
                 change_type='added',
                 old_checksum=None,
-                new_checksum=checksum
+                new_checksum=checksum,
+                new_fingerprint=fingerprint
             ))
-        elif old_checksum != checksum:
+        elif checksum_matches(fingerprint_checksum(old_entry), checksum, ios_path / rel_path):
+            # Same contents with a new mtime or an older entry format;
+            # store the fresh fingerprint on next save
+            state.checksums[rel_path] = fingerprint
+        else:
             # Modified file
             changes.append(FileChange(
                 ios_path=rel_path,
                 android_path=android_path,
                 change_type='modified',
-                old_checksum=old_checksum,
-                new_checksum=checksum
+                old_checksum=fingerprint_checksum(old_entry),
+                new_checksum=checksum,
+                new_fingerprint=fingerprint
             ))
     
     # Check for deleted files
-    for rel_path in state.checksums:
-        if rel_path not in current_files:
-            changes.append(FileChange(
-                ios_path=rel_path,
-                android_path=state.file_mapping.get(rel_path),
-                change_type='deleted',
-                old_checksum=state.checksums[rel_path],
-                new_checksum=None
-            ))
+    for rel_path in deleted:
+        changes.append(FileChange(
+            ios_path=rel_path,
+            android_path=state.file_mapping.get(rel_path),
+            change_type='deleted',
+            old_checksum=fingerprint_checksum(state.checksums[rel_path]),
+            new_checksum=None
+        ))
     
     return changes
 
 
-def classify_file(filepath: str, content: str) -> str:
-    """Classify a Swift file into a category."""
+def content_kind(content: str) -> str:
+    """The content-based part of classify_file: 'view', 'model' or ''.
+    
+    Depends only on the file's contents, so it can be cached by checksum.
+    Plain substring checks outrun a combined regex here, since each stops at
+    its first hit; 'UIViewController' contains 'View', so files without
+    'View' skip both view checks after a single scan.
+    """
+    if 'View' in content and ('body:' in content or 'UIViewController' in content):
+        return 'view'
+    elif 'struct' in content and 'Codable' in content:
+        return 'model'
+    return ''
+
+
+def classify_file(filepath: str, content: str, kind: Optional[str] = None) -> str:
+    """Classify a Swift file into a category.
+    
+    kind is content_kind(content) if already known; it is only computed
+    here when the path alone doesn't decide the category.
+    """
     path_lower = filepath.lower()
     name = Path(filepath).stem.lower()
     
@@ -173,11 +635,12 @@ def classify_file(filepath: str, content: str) -> str:
         return 'test'
     elif 'viewmodel' in name or 'vm' in name:
         return 'viewmodel'
-    elif 'View' in content and 'body:' in content:
-        return 'view'
-    elif 'UIViewController' in content:
+    
+    if kind is None:
+        kind = content_kind(content)
+    if kind == 'view':
         return 'view'
-    elif 'model' in path_lower or ('struct' in content and 'Codable' in content):
+    elif 'model' in path_lower or kind == 'model':
         return 'model'
     elif 'service' in path_lower or 'api' in path_lower or 'network' in path_lower:
         return 'service'
@@ -188,34 +651,56 @@ def classify_file(filepath: str, content: str) -> str:
     return 'other'
 
 
+# Swift -> Kotlin rewrites, fused into one alternation so each file is
+# scanned once. Fixed tokens map through _REPLACEMENTS; return types and
+# interpolations capture a fragment that _rewrite_token rewrites in turn.
+_REPLACEMENTS = {
+    'let': 'val', 'func': 'fun', 'nil': 'null', 'self': 'this',
+    'struct': 'data class', 'enum': 'enum class', 'protocol': 'interface',
+    'Bool': 'Boolean',
+    '??': '?:', '-> Void': ': Unit', '.count': '.size', '.isEmpty': '.isEmpty()',
+    '.append(': '.add(', 'print(': 'println(',
+}
+
+# The leading lookahead lists every character a match can start with, which
+# lets the regex engine skip ahead to candidate positions instead of trying
+# each alternative at every character.
+_SWIFT_TO_KOTLIN_RE = re.compile(
+    r'(?=[lfnsepB?\-.\\])(?:'
+    r'\b(?:let|func|nil|self|struct|enum|protocol|Bool)\b'
+    r'|\?\?|-> Void|\.(?:count|isEmpty)\b|\.append\(|print\('
+    r'|-> (?:(?P<ret_prefix>\w*?)(?=print\()|(?P<ret>\w+))'
+    r'|\\\((?P<interp>[^)]+)\)'
+    r')'
+)
+
+
+def _rewrite_token(m: re.Match) -> str:
+    """Return the Kotlin replacement for one _SWIFT_TO_KOTLIN_RE match."""
+    ret = m.group('ret')
+    if ret is not None:
+        return ': ' + _REPLACEMENTS.get(ret, ret)
+    ret_prefix = m.group('ret_prefix')
+    if ret_prefix is not None:
+        # A return type running into print( (e.g. "-> reprint("): leave the
+        # print( to its own rule
+        return ': ' + ret_prefix
+    interp = m.group('interp')
+    if interp is not None:
+        # Interpolated expressions get the same rewrites as the code around them
+        return '${' + _SWIFT_TO_KOTLIN_RE.sub(_rewrite_token, interp) + '}'
+    return _REPLACEMENTS[m.group()]
+
+
 def convert_swift_to_kotlin(swift_content: str) -> str:
     """Convert Swift to Kotlin (basic)."""
-    import re
-    kotlin = swift_content
-    
-    replacements = [
-        (r'\blet\b', 'val'), (r'\bvar\b', 'var'), (r'\bfunc\b', 'fun'),
-        (r'\bnil\b', 'null'), (r'\bself\b', 'this'), (r'\bstruct\b', 'data class'),
-        (r'\benum\b', 'enum class'), (r'\bprotocol\b', 'interface'),
-        (r'\bBool\b', 'Boolean'), (r'\?\?', '?:'),
-        (r'-> Void', ': Unit'), (r'-> (\w+)', r': \1'),
-        (r'\\\(([^)]+)\)', r'${\1}'),
-        (r'\.count\b', '.size'), (r'\.isEmpty\b', '.isEmpty()'),
-        (r'\.append\(', '.add('), (r'print\(', 'println('),
-    ]
-    
-    for pattern, replacement in replacements:
-        kotlin = re.sub(pattern, replacement, kotlin)
-    
-    return kotlin
+    return _SWIFT_TO_KOTLIN_RE.sub(_rewrite_token, swift_content)
 
 
-def determine_android_path(ios_path: str, file_type: str, package_name: str) -> str:
-    """Determine the Android path for a converted file."""
+def _build_dir_table(package_name: str) -> dict[str, str]:
+    """Map each file type to its Android source directory for a package."""
     pkg_path = package_name.replace('.', '/')
-    filename = Path(ios_path).stem + ".kt"
-    
-    type_to_dir = {
+    return {
         'model': f'app/src/main/java/{pkg_path}/model',
         'viewmodel': f'app/src/main/java/{pkg_path}/viewmodel',
         'view': f'app/src/main/java/{pkg_path}/ui/screens',
@@ -224,14 +709,58 @@ def determine_android_path(ios_path: str, file_type: str, package_name: str) ->
         'utility': f'app/src/main/java/{pkg_path}/util',
         'other': f'app/src/main/java/{pkg_path}',
     }
+
+
+def determine_android_path(ios_path: str, file_type: str, dir_table: dict[str, str]) -> str:
+    """Determine the Android path for a converted file.
+    
+    dir_table comes from _build_dir_table, built once per sync.
+    """
+    filename = os.path.splitext(os.path.basename(ios_path))[0] + ".kt"
+    return dir_table.get(file_type, dir_table['other']) + '/' + filename
+
+
+def _wrap_conflict(old: bytes, new: bytes) -> list[bytes]:
+    """Wrap existing Android code and incoming converted code in conflict markers.
     
-    dir_path = type_to_dir.get(file_type, type_to_dir['other'])
-    return f"{dir_path}/{filename}"
+    Returns the pieces of the merged file for _write_chunks rather than
+    joining them, so the file is never held in memory twice.
+    """
+    return [CONFLICT_HEADER, old, CONFLICT_SEPARATOR, new, CONFLICT_FOOTER]
+
+
+def _write_chunks(path: Path, chunks: list[bytes]) -> None:
+    """Write chunks to path back to back, with one writev() where available."""
+    if not hasattr(os, 'writev'):
+        with open(path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+        return
+    
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_CLOEXEC', 0), 0o666)
+    try:
+        views = [memoryview(chunk) for chunk in chunks if chunk]
+        while views:
+            # writev may stop short; drop what was written and go again
+            written = os.writev(fd, views)
+            while views and written >= len(views[0]):
+                written -= len(views.pop(0))
+            if views:
+                views[0] = views[0][written:]
+    finally:
+        os.close(fd)
 
 
 def apply_change(change: FileChange, ios_path: Path, android_path: Path, 
-                 package_name: str, dry_run: bool = False) -> Optional[str]:
-    """Apply a single file change."""
+                 package_name: str, dry_run: bool = False,
+                 classifications: Optional[dict] = None,
+                 dir_table: Optional[dict[str, str]] = None) -> Optional[str]:
+    """Apply a single file change.
+    
+    classifications caches content_kind() by checksum across files and
+    syncs; it is updated in place. dir_table is _build_dir_table's result
+    for package_name, built here if not passed in.
+    """
     
     if change.change_type == 'deleted':
         if change.android_path:
@@ -249,8 +778,15 @@ def apply_change(change: FileChange, ios_path: Path, android_path: Path,
     if not source.exists():
         return None
     
-    swift_content = source.read_text(errors='ignore')
-    file_type = classify_file(change.ios_path, swift_content)
+    swift_content = source.read_bytes().decode('utf-8', 'ignore')
+    if classifications is None:
+        classifications = {}
+    kind = classifications.get(change.new_checksum)
+    if kind is None:
+        kind = content_kind(swift_content)
+        if change.new_checksum:
+            classifications[change.new_checksum] = kind
+    file_type = classify_file(change.ios_path, swift_content, kind)
     
     # Skip test files for now
     if file_type == 'test':
@@ -261,7 +797,9 @@ def apply_change(change: FileChange, ios_path: Path, android_path: Path,
     if change.android_path:
         target_rel = change.android_path
     else:
-        target_rel = determine_android_path(change.ios_path, file_type, package_name)
+        if dir_table is None:
+            dir_table = _build_dir_table(package_name)
+        target_rel = determine_android_path(change.ios_path, file_type, dir_table)
     
     target = android_path / target_rel
     
@@ -278,31 +816,67 @@ def apply_change(change: FileChange, ios_path: Path, android_path: Path,
     else:
         target.parent.mkdir(parents=True, exist_ok=True)
         
-        if change.change_type == 'modified' and target.exists():
+        # Leave a byte-identical target alone so its mtime, and the Gradle
+        # caches keyed on it, survive no-op re-syncs
+        try:
+            existing = target.read_bytes()
+        except FileNotFoundError:
+            existing = None
+        data = kotlin_content.encode('utf-8')
+        if existing == data:
+            print(f"  Unchanged: {target_rel}")
+            return target_rel
+        
+        if change.change_type == 'modified' and existing is not None:
             # Add conflict markers if file has local changes
-            old_content = target.read_text()
-            if old_content != kotlin_content:
-                kotlin_content = f'''// <<<<<<< ANDROID (local)
-// The following is the existing Android code.
-// Review and merge with the iOS changes below.
-// =======
-
-{old_content}
-
-// >>>>>>> iOS (incoming)
-// The following is the converted iOS code.
-// =======
-
-{kotlin_content}
-'''
+            chunks = _wrap_conflict(existing, data)
+        else:
+            chunks = [data]
         
-        target.write_text(kotlin_content)
+        _write_chunks(target, chunks)
         action = "Updated" if change.change_type == 'modified' else "Created"
         print(f"  {action}: {target_rel}")
     
     return target_rel
 
 
+def _apply_one(change: FileChange, ios_path: Path, android_path: Path,
+               package_name: str, dry_run: bool, classifications: dict,
+               dir_table: dict[str, str]) -> tuple[Optional[str], str, dict]:
+    """Run apply_change in a worker process.
+    
+    Returns its result along with what it printed and the classifications
+    dict it updated, for the parent to replay in order.
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        result = apply_change(change, ios_path, android_path, package_name, dry_run,
+                              classifications, dir_table)
+    return result, output.getvalue(), classifications
+
+
+def _apply_parallel(changes: list[FileChange], ios_path: Path, android_path: Path,
+                    package_name: str, dry_run: bool, classifications: dict,
+                    dir_table: dict[str, str]) -> Optional[list[tuple[Optional[str], str, dict]]]:
+    """Apply added and modified changes across worker processes.
+    
+    Each worker only gets the cached classification for its own file.
+    Returns _apply_one's results in order, or None if worker processes
+    can't be started here.
+    """
+    kinds = ({c.new_checksum: classifications[c.new_checksum]}
+             if c.new_checksum in classifications else {} for c in changes)
+    try:
+        pool = ProcessPoolExecutor()
+    except (OSError, NotImplementedError):
+        return None
+    n = len(changes)
+    with pool:
+        return list(pool.map(_apply_one, changes, repeat(ios_path, n), repeat(android_path, n),
+                             repeat(package_name, n), repeat(dry_run, n), kinds,
+                             repeat(dir_table, n), chunksize=8))
+
+
 def sync_projects(ios_path: Path, android_path: Path, 
                   since: Optional[str] = None,
                   files: Optional[list[str]] = None,
@@ -323,11 +897,25 @@ def sync_projects(ios_path: Path, android_path: Path,
     
     # Detect changes
     print("Detecting changes...")
-    changes = detect_changes(ios_path, state)
+    # Only the files git reports are looked at when the last sync recorded
+    # both its commit and which files were dirty at the time
+    git_status = get_git_status(ios_path)
+    head, worktree = git_status if git_status else (None, None)
+    changed = None
+    if head and state.ios_commit and state.dirty_files is not None:
+        changed = get_changed_files_git(ios_path, state.ios_commit, head, worktree)
+    changes = detect_changes(ios_path, state, changed)
     
-    # Filter by specific files if requested
+    # Filter by specific files if requested; one alternation matches every
+    # requested fragment in a single search per path
+    # The recorded commit only moves forward once every detected change has
+    # been applied; anything filtered out or declined must come up again
+    complete = True
     if files:
-        changes = [c for c in changes if any(f in c.ios_path for f in files)]
+        wanted = re.compile('|'.join(map(re.escape, files)))
+        selected = [c for c in changes if wanted.search(c.ios_path)]
+        complete = len(selected) == len(changes)
+        changes = selected
     
     if not changes:
         print("No changes detected.")
@@ -351,6 +939,16 @@ def sync_projects(ios_path: Path, android_path: Path,
     # Apply changes
     new_mapping = dict(state.file_mapping)
     new_checksums = dict(state.checksums)
+    dir_table = _build_dir_table(state.package_name)
+    
+    # Conversion is independent per file, so large non-interactive syncs
+    # spread it over worker processes; deletions stay in this process
+    applied = None
+    non_deleted = [c for c in changes if c.change_type != 'deleted']
+    if not interactive and len(non_deleted) >= PROCESS_MIN_FILES and (os.cpu_count() or 1) > 1:
+        applied = _apply_parallel(non_deleted, ios_path, android_path, state.package_name,
+                                  dry_run, state.classifications, dir_table)
+    applied = iter(applied) if applied is not None else None
     
     for change in changes:
         if interactive and not dry_run:
@@ -359,9 +957,16 @@ def sync_projects(ios_path: Path, android_path: Path,
                 print("Sync aborted.")
                 return
             if response != 'y':
+                complete = False
                 continue
         
-        result = apply_change(change, ios_path, android_path, state.package_name, dry_run)
+        if applied is not None and change.change_type != 'deleted':
+            result, output, kinds = next(applied)
+            sys.stdout.write(output)
+            state.classifications.update(kinds)
+        else:
+            result = apply_change(change, ios_path, android_path, state.package_name, dry_run,
+                                  state.classifications, dir_table)
         
         if not dry_run:
             if change.change_type == 'deleted':
@@ -373,14 +978,26 @@ def sync_projects(ios_path: Path, android_path: Path,
                 if result:
                     new_mapping[change.ios_path] = result
                 if change.new_checksum:
-                    new_checksums[change.ios_path] = change.new_checksum
+                    new_checksums[change.ios_path] = change.new_fingerprint
     
     # Update sync state
     if not dry_run:
-        state.last_sync_date = datetime.now().isoformat()
-        state.ios_commit = get_git_commit(ios_path)
+        state.last_sync_date = datetime.now(timezone.utc).isoformat()
+        dirty = None if worktree is None else [p for p in worktree if not _is_excluded(p)]
+        if complete:
+            state.ios_commit = head
+            state.dirty_files = dirty
+        elif state.dirty_files is not None and dirty is not None:
+            # Still diffing from the old commit, so keep rechecking what was
+            # dirty at any sync since then
+            state.dirty_files = list(dict.fromkeys([*state.dirty_files, *dirty]))
         state.file_mapping = new_mapping
         state.checksums = new_checksums
+        # Only keep cached classifications for contents still in the project
+        live = {fingerprint_checksum(entry) for entry in new_checksums.values()}
+        state.classifications = {
+            checksum: kind for checksum, kind in state.classifications.items() if checksum in live
+        }
         save_sync_state(android_path, state)
         print()
         print("Sync complete. State updated.")